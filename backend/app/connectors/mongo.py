@@ -2,7 +2,13 @@
 from motor.motor_asyncio import AsyncIOMotorClient
 from bson import ObjectId
 from datetime import datetime
+import asyncio
 import json
+import logging
+
+from app.connectors import mongo_schema
+
+logger = logging.getLogger(__name__)
 
 class MongoInspector:
     allowed_functions = [
@@ -22,6 +28,134 @@ class MongoInspector:
         self.client = AsyncIOMotorClient(uri)
         self.db = self.client[self.cfg.database]
 
+    async def infer_schema(self, collections: list) -> dict:
+        """
+        Field paths, types and frequencies per collection, sampled with $sample.
+        Cached per collection; resampled only as much as the document count changed.
+        Best-effort: a collection that cannot be sampled (views, system.*,
+        missing permissions) gets an empty schema instead of failing the run.
+        """
+        limit = asyncio.Semaphore(mongo_schema.MAX_CONCURRENT_SAMPLES)
+        schemas = await asyncio.gather(*(self._collection_schema(c, limit) for c in collections))
+        return dict(zip(collections, schemas))
+
+    async def _collection_schema(self, col_name: str, limit: asyncio.Semaphore) -> dict:
+        key = (self.cfg.host, self.cfg.database, col_name)
+        col = self.db[col_name]
+        async with limit:
+            try:
+                count = await col.estimated_document_count()
+                cached = mongo_schema.get_cached(key)
+                size = mongo_schema.sample_size(cached, count)
+                if size == 0:
+                    return cached
+                docs = await col.aggregate([{"$sample": {"size": size}}]).to_list(size)
+                return mongo_schema.store(key, count, docs)
+            except Exception as e:
+                logger.warning("Schema sampling failed for %s: %s", col_name, e)
+                return mongo_schema.get_cached(key) or mongo_schema.empty_schema()
+
+    def schema_hints(self, schemas: dict, prompt: str = "") -> str:
+        return mongo_schema.schema_hints(schemas, prompt)
+
+    async def stream(self, query: dict, batch_size: int = 5000, with_types: bool = True):
+        """
+        Stream a collection (optionally filtered / projected) in batches of rows.
+        Columns are the projection's fields (dotted paths allowed), else every
+        top-level field of the matching documents, found by a server-side pass.
+        Column types are only scanned for `with_types` (Parquet / Arrow), else None.
+        Returns (columns, column types, async iterator of row lists).
+        """
+        col_name = query.get("collection")
+        if not col_name:
+            raise ValueError(f"Export query must include 'collection'. Provided: {query}")
+        projection = query.get("projection")
+        flt = self._convert_ids(self._convert_dates(query.get("filter", {})))
+        cursor = self.db[col_name].find(flt, projection).batch_size(batch_size)
+        first = await cursor.to_list(batch_size)
+
+        included = [k for k, v in (projection or {}).items() if v]
+        if included:
+            columns = included if "_id" in projection else ["_id"] + included
+            types = await self._export_types(col_name, flt, columns) if with_types else None
+        else:
+            columns, types = await self._export_fields(col_name, flt, first)
+            if not with_types:
+                types = None
+
+        async def batches():
+            batch = first
+            while batch:
+                yield [[self._serialize(self._field(doc, c)) for c in columns] for doc in batch]
+                batch = await cursor.to_list(batch_size)
+
+        return columns, types, batches()
+
+    async def _export_types(self, col_name: str, flt: dict, columns: list) -> list:
+        """
+        Exact BSON types of every exported field over all matching documents,
+        collected server-side with $type, mapped to exporters column types.
+        """
+        if not columns:
+            return []
+        group = {"_id": None}
+        for i, c in enumerate(columns):
+            group[f"t{i}"] = {"$addToSet": {"$type": f"${c}"}}
+        try:
+            found = await self.db[col_name].aggregate([{"$match": flt}, {"$group": group}]).to_list(1)
+        except Exception as e:
+            logger.warning("Type scan failed for %s, exporting as text: %s", col_name, e)
+            return ["string"] * len(columns)
+        seen = found[0] if found else {}
+        return [self._column_type(seen.get(f"t{i}", [])) for i in range(len(columns))]
+
+    async def _export_fields(self, col_name: str, flt: dict, first: list):
+        """
+        Every top-level field of the matching documents with its column type,
+        in one server-side pass. Fields of the first batch keep their order.
+        """
+        pipeline = [
+            {"$match": flt},
+            {"$project": {"kv": {"$objectToArray": "$$ROOT"}}},
+            {"$unwind": "$kv"},
+            {"$group": {"_id": "$kv.k", "types": {"$addToSet": {"$type": "$kv.v"}}}},
+        ]
+        found = {f["_id"]: f["types"] for f in await self.db[col_name].aggregate(pipeline).to_list(None)}
+        columns = []
+        for doc in first:
+            columns.extend(k for k in doc if k not in columns)
+        columns += sorted(k for k in found if k not in columns)
+        return columns, [self._column_type(found.get(c, [])) for c in columns]
+
+    @staticmethod
+    def _column_type(bson_types: list) -> str:
+        bson_types = set(bson_types) - {"null", "missing"}
+        if bson_types and bson_types <= {"int", "long"}:
+            return "integer"
+        if bson_types and bson_types <= {"int", "double"}:
+            return "float"  # 32-bit ints widen to float64 exactly
+        if bson_types == {"bool"}:
+            return "boolean"
+        return "string"  # dates are serialized to ISO strings
+
+    def _field(self, doc: dict, path: str):
+        """
+        Value at a dotted path of a document; through an array of
+        subdocuments it is the list of their values, as MongoDB projects it.
+        """
+        if path in doc:
+            return doc[path]
+        value = doc
+        parts = path.split(".")
+        for i, part in enumerate(parts):
+            if isinstance(value, list):
+                rest = ".".join(parts[i:])
+                return [self._field(v, rest) for v in value if isinstance(v, dict)]
+            if not isinstance(value, dict):
+                return None
+            value = value.get(part)
+        return value
+
     async def execute(self, query_input: dict, collections: list):
         """Execute multiple queries on multiple collections"""
         queries = query_input.get("query")
@@ -0,0 +1,153 @@
+# mongo_schema.py
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+from bson import ObjectId
+
+SAMPLE_SIZE = 200  # documents sampled for a collection seen for the first time
+MIN_RESAMPLE = 20  # smallest incremental sample once the document count changes
+SCHEMA_TTL_SECONDS = 600  # unchanged collections are re-checked after this
+MAX_DEPTH = 4
+MAX_HINT_FIELDS = 40
+MAX_HINT_CHARS = 6000  # all collection hints of one prompt together
+MAX_CONCURRENT_SAMPLES = 8  # collections sampled at once per infer_schema call
+
+# (host, database, collection) -> {"count", "sampled", "fields", "at"}
+# fields: dotted path -> {"seen": n, "types": {type name: n}}
+_cache: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+
+
+def type_name(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int"
+    if isinstance(value, float):
+        return "double"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, ObjectId):
+        return "objectId"
+    if isinstance(value, datetime):
+        return "date"
+    if isinstance(value, dict):
+        return "object"
+    if isinstance(value, list):
+        return "array"
+    return type(value).__name__
+
+
+def collect_fields(doc: Dict[str, Any], fields: Dict[str, Any], prefix: str = "", depth: int = 0) -> None:
+    """
+    Add every field path of `doc` to `fields`; array elements appear as `path[]`.
+    """
+    for key, value in doc.items():
+        path = f"{prefix}{key}"
+        _add(fields, path, value)
+        if depth >= MAX_DEPTH:
+            continue
+        if isinstance(value, dict):
+            collect_fields(value, fields, path + ".", depth + 1)
+        elif isinstance(value, list):
+            seen = set()
+            for item in value:
+                t = type_name(item)
+                if t not in seen:
+                    seen.add(t)
+                    _add(fields, path + "[]", item)
+                if isinstance(item, dict):
+                    collect_fields(item, fields, path + "[].", depth + 1)
+
+
+def _add(fields: Dict[str, Any], path: str, value: Any) -> None:
+    entry = fields.setdefault(path, {"seen": 0, "types": {}})
+    entry["seen"] += 1
+    t = type_name(value)
+    entry["types"][t] = entry["types"].get(t, 0) + 1
+
+
+def merge_fields(into: Dict[str, Any], other: Dict[str, Any]) -> None:
+    for path, entry in other.items():
+        target = into.setdefault(path, {"seen": 0, "types": {}})
+        target["seen"] += entry["seen"]
+        for t, n in entry["types"].items():
+            target["types"][t] = target["types"].get(t, 0) + n
+
+
+def sample_size(cached: Dict[str, Any], count: int) -> int:
+    """
+    How many documents to sample now; 0 when the cached schema is still fresh.
+    """
+    if not cached:
+        return SAMPLE_SIZE
+    changed = abs(count - cached["count"])
+    if changed == 0 and time.time() - cached["at"] < SCHEMA_TTL_SECONDS:
+        return 0
+    return max(MIN_RESAMPLE, min(changed, SAMPLE_SIZE))
+
+
+def schema_hint(collection: str, schema: Dict[str, Any]) -> str:
+    """
+    One compact line per collection, e.g.
+    orders(~1200 docs): _id objectId; customer.name string; items[] object; note string|null 40%
+    """
+    sampled = schema["sampled"] or 1
+    fields = sorted(schema["fields"].items(), key=lambda kv: -kv[1]["seen"])[:MAX_HINT_FIELDS]
+    parts = []
+    for path, entry in sorted(fields):
+        types = "|".join(sorted(entry["types"], key=lambda t: -entry["types"][t]))
+        part = f"{path} {types}"
+        freq = entry["seen"] / sampled
+        if freq < 0.95 and not path.endswith("[]") and "[]." not in path:
+            part += f" {round(freq * 100)}%"
+        parts.append(part)
+    return f"{collection}(~{schema['count']} docs): " + "; ".join(parts)
+
+
+def schema_hints(schemas: Dict[str, Dict[str, Any]], prompt: str = "") -> str:
+    """
+    Hint lines for one prompt, collections the prompt mentions first, until
+    MAX_HINT_CHARS is used up.
+    """
+    text = prompt.lower()
+    ordered = sorted(schemas, key=lambda c: c.lower() not in text)
+    lines, size = [], 0
+    for collection in ordered:
+        schema = schemas[collection]
+        if not schema["fields"]:
+            continue
+        line = schema_hint(collection, schema)
+        if size + len(line) > MAX_HINT_CHARS:
+            continue  # a shorter line may still fit
+        lines.append(line)
+        size += len(line) + 1
+    return "\n".join(lines)
+
+
+def empty_schema() -> Dict[str, Any]:
+    return {"count": 0, "sampled": 0, "fields": {}, "at": 0}
+
+
+def get_cached(key: Tuple[str, str, str]) -> Dict[str, Any]:
+    return _cache.get(key, {})
+
+
+def store(key: Tuple[str, str, str], count: int, docs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Merge a fresh sample into the cached schema of a collection.
+    """
+    fields: Dict[str, Any] = {}
+    for doc in docs:
+        collect_fields(doc, fields)
+    cached = _cache.get(key)
+    if cached is None:
+        cached = empty_schema()
+        _cache[key] = cached
+    merge_fields(cached["fields"], fields)
+    cached["sampled"] += len(docs)
+    cached["count"] = count
+    cached["at"] = time.time()
+    return cached
@@ -1,8 +1,21 @@
 import asyncpg
-from typing import Any, Dict, List, Union
+from typing import Any, AsyncIterator, Dict, List, Tuple, Union
+
+
+# server errors, plus asyncpg's client-side DataError (e.g. bad parameter types)
+STATEMENT_ERRORS = (asyncpg.PostgresError, asyncpg.exceptions.DataError)
 
 
 class SQLInspector:
+    # Postgres type name -> exporters column type; numeric and the rest export as text
+    EXPORT_TYPES = {
+        "int2": "integer", "int4": "integer", "int8": "integer",
+        "float4": "float", "float8": "float",
+        "bool": "boolean",
+        "date": "date",
+        "timestamp": "timestamp", "timestamptz": "timestamptz",
+    }
+
     def __init__(self, cfg: Dict[str, Any]):
         self.cfg = cfg
         self.conn: asyncpg.Connection | None = None
@@ -38,19 +51,27 @@ class SQLInspector:
 
     async def execute(
         self,
-        payload: Union[str, Dict[str, Any]],
+        payload: Union[str, Dict[str, Any], List[Any]],
     ) -> Any:
         """
         Supports:
         - Raw SQL string
         - Dict with: action, query, params
+        - List of the above (or a dict whose "query" is such a list),
+          run as one transaction; see _execute_plan
         """
 
         if isinstance(payload, str):
             return await self._execute_sql(payload, [])
 
+        if isinstance(payload, list):
+            return await self._execute_plan(payload)
+
         if isinstance(payload, dict):
             query = payload.get("query")
+            if isinstance(query, list):
+                return await self._execute_plan(query)
+
             params = payload.get("params", [])
             action = payload.get("action", "").lower()
 
@@ -61,6 +82,95 @@ class SQLInspector:
 
         raise ValueError("Unsupported SQL payload")
 
+    async def stream(
+        self,
+        query: str,
+        params: List[Any] | None = None,
+        batch_size: int = 5000,
+    ) -> Tuple[List[str], List[str], AsyncIterator[List[asyncpg.Record]]]:
+        """
+        Run a read query through a server-side cursor in a READ ONLY transaction.
+        Returns the column names, their export types (from the declared
+        column types) and an async iterator of Record batches.
+        """
+        stmt = await self.conn.prepare(query)
+        attributes = stmt.get_attributes()
+        if not attributes:
+            raise ValueError("Only queries returning rows can be exported")
+        columns = [a.name for a in attributes]
+        types = [self.EXPORT_TYPES.get(a.type.name, "string") for a in attributes]
+
+        # READ ONLY also rejects writes hidden in CTEs (WITH d AS (DELETE ...));
+        # the first fetch runs here so such errors surface before streaming starts
+        tr = self.conn.transaction(readonly=True)
+        await tr.start()
+        try:
+            cursor = await stmt.cursor(*(params or []))
+            first = await cursor.fetch(batch_size)
+        except Exception:
+            await tr.rollback()
+            raise
+
+        async def batches():
+            try:
+                rows = first
+                while rows:
+                    yield rows
+                    rows = await cursor.fetch(batch_size)
+            finally:
+                await tr.rollback()  # nothing to commit in a read-only transaction
+
+        return columns, types, batches()
+
+    # -------------------- Multi-statement Plans --------------------
+
+    async def _execute_plan(self, statements: List[Any]) -> List[Dict[str, Any]]:
+        """
+        Run statements in order inside a single transaction on this connection.
+        Each item is a SQL string or a dict with: query, params, action, and
+        - "many": list of param lists, sent pipelined via executemany
+        - "optional": true to run under a savepoint; a failure rolls back only
+          that statement and the plan continues
+        Any other failure rolls back the whole plan.
+        Returns one entry per statement: {statement, result, error}.
+        """
+        if not statements:
+            raise ValueError("SQL plan is empty")
+
+        results = []
+        async with self.conn.transaction():
+            for i, stmt in enumerate(statements):
+                if isinstance(stmt, str):
+                    stmt = {"query": stmt}
+                if not isinstance(stmt, dict) or not isinstance(stmt.get("query"), str):
+                    raise ValueError(f"Statement {i}: SQL query must be a string")
+
+                if not stmt.get("optional"):
+                    try:
+                        result = await self._execute_statement(stmt)
+                    except STATEMENT_ERRORS as e:
+                        raise ValueError(f"Statement {i} failed, transaction rolled back: {e}") from e
+                    results.append({"statement": i, "result": result, "error": None})
+                    continue
+
+                try:
+                    async with self.conn.transaction():  # nested -> SAVEPOINT
+                        result = await self._execute_statement(stmt)
+                    results.append({"statement": i, "result": result, "error": None})
+                except STATEMENT_ERRORS as e:
+                    results.append({"statement": i, "result": None, "error": str(e)})
+
+        return results
+
+    async def _execute_statement(self, stmt: Dict[str, Any]) -> Any:
+        many = stmt.get("many")
+        if many is not None:
+            await self.conn.executemany(stmt["query"], many)
+            return {"status": "EXECUTEMANY", "batches": len(many)}
+        return await self._execute_sql(
+            stmt["query"], stmt.get("params", []), stmt.get("action", "").lower()
+        )
+
     # -------------------- Core Executor --------------------
 
     async def _execute_sql(
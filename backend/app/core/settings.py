@@ -5,6 +5,9 @@ from pydantic import Field
 
 class Settings(BaseSettings):
     openai_api_key: str = Field(..., env="OPENAI_API_KEY")
+    job_workers: int = Field(4, env="JOB_WORKERS")
+    job_tenant_limit: int = Field(2, env="JOB_TENANT_LIMIT")
+    job_max_pending: int = Field(100, env="JOB_MAX_PENDING")
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -1,70 +1,631 @@
 # backend/db_processor.py
+import hashlib
 import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+import weakref
+from itertools import islice
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 
-STORAGE_PATH = Path(__file__).parent / "storage" / "uploaded.json"
-STORAGE_PATH.parent.mkdir(parents=True, exist_ok=True)
+from app.profiling import merge_profiles, profile_rows, profile_table
+
+STORAGE_PATH = Path(__file__).parent / "storage" / "uploaded.json"  # legacy single-file storage
+PROFILES_PATH = Path(__file__).parent / "storage" / "profiles.json"
+TABLES_PATH = Path(__file__).parent / "storage" / "tables"
+CATALOG_PATH = TABLES_PATH / "catalog.json"
+TABLES_PATH.mkdir(parents=True, exist_ok=True)
 
 MAX_PREVIEW_ROWS = 500  # safety
+COMPACT_AFTER_SEGMENTS = 8  # merge a table's segments in the background past this
+COMPACT_MAX_PASSES = 3  # extra passes pick up segments written during compaction
+GARBAGE_GRACE_SECONDS = 300  # compacted segments stay readable this long
+PROFILE_CHUNK_ROWS = 50000  # rows held at once while compaction re-profiles a table
+
+# Layout: storage/tables/catalog.json maps table name -> directory.
+# Each table directory holds
+#   manifest.json   columns, optional key columns, ordered segment list,
+#                   current index file and its committed size
+#   seg-NNNNNN.ndjson  append-only segments, one compact "[seq, row]" per line
+#   hashes-NNNNNN.log  the index: "<key>\t<row hash>\t<seq>" lines for keyed
+#                   tables, "<row hash>" lines for keyless ones
+# Every stored row version gets a new seq. Writes only append a segment and
+# index lines, then commit both by saving the manifest; index lines past the
+# committed size belong to an interrupted write and are ignored. Reads stream
+# the segments and, for keyed tables, skip rows whose seq is not the latest
+# one the index holds for their key.
+
+_lock = threading.RLock()  # guards the catalog, manifests, indexes and profiles
+_catalog: Optional[Dict[str, str]] = None
+_manifests: Dict[str, Dict[str, Any]] = {}
+_indexes: Dict[str, Any] = {}  # table name -> key index (dict) or row hashes (set)
+_compacting: set = set()
+_readers: Dict[str, "weakref.WeakSet[_Snapshot]"] = {}  # table name -> active keyed reads
+_profiles: Optional[Dict[str, Any]] = None  # table name -> profile, loaded once
+
+def save_payload(payload: Dict[str, Any], mode: str = "replace", key: Optional[List[str]] = None) -> None:
+    """
+    Save the normalized payload to storage.
+    mode:
+    - "replace": drop every stored table first (previous behaviour), keep every row
+    - "append": add rows to existing tables, skipping rows already stored
+    - "upsert": rows whose `key` columns match a stored row replace it
+    `key` also works with "replace" to create keyed tables up front; the first
+    upsert onto a keyless table makes `key` its key. Keyed tables always hold
+    one row per key.
+    Only the delta is written; column profiles are updated from it.
+    """
+    if mode not in ("replace", "append", "upsert"):
+        raise ValueError(f"Unsupported save mode: {mode}")
+    if mode == "upsert" and not key:
+        raise ValueError("Upsert requires key columns")
+
+    tables = payload.get("tables", [])
+    table_key = key if mode != "append" else None
+    with _lock:
+        # check every table before anything is dropped or created
+        for table in tables:
+            _columns_after(table, table_key, None if mode == "replace" else _manifest(table["name"]))
+        profiles = dict(load_profiles())
+        if mode == "replace":
+            _drop_all()
+            profiles = {}
+        try:
+            for table in tables:
+                written, replaced = _write_rows(table, table_key, dedupe=mode != "replace")
+                delta = profile_table(written)
+                name = table["name"]
+                profile = merge_profiles(profiles[name], delta) if name in profiles else delta
+                if replaced:
+                    _drop_replaced(profile, replaced)
+                profiles[name] = profile
+        finally:
+            save_profiles(profiles)
+
+    for table in tables:
+        _maybe_compact(table["name"])
+
+def _drop_replaced(profile: Dict[str, Any], replaced: int) -> None:
+    # row counts stay exact; the sketches still include the replaced versions
+    profile["rows"] -= replaced
+    for col in profile["columns"]:
+        col["count"] -= replaced
+    profile["stale"] = True
+
+# ---------------- Profiles ----------------
+
+def save_profiles(profiles: Dict[str, Any]) -> None:
+    global _profiles
+    with open(PROFILES_PATH, "w", encoding="utf-8") as f:
+        json.dump(profiles, f, ensure_ascii=False, separators=(",", ":"), default=str)
+    _profiles = profiles
+
+def load_profiles() -> Dict[str, Any]:
+    global _profiles
+    if _profiles is None:
+        if PROFILES_PATH.exists():
+            with open(PROFILES_PATH, "r", encoding="utf-8") as f:
+                _profiles = json.load(f)
+        else:
+            # data uploaded before profiling existed: profile it once now
+            save_profiles({t["name"]: profile_table(t) for t in load_payload().get("tables", [])})
+    return _profiles
 
-def save_payload(payload: Dict[str, Any]) -> None:
+def get_profile(table_name: str) -> Optional[Dict[str, Any]]:
     """
-    Save the normalized payload to storage (overwrites latest).
+    Precomputed column profiles of a stored table (no row scan).
+    After upserts the row count is exact but the column stats also cover
+    replaced rows ("stale": true) until the table is next compacted.
     """
-    with open(STORAGE_PATH, "w", encoding="utf-8") as f:
-        json.dump(payload, f, indent=2, ensure_ascii=False)
+    return load_profiles().get(table_name)
+
+# ---------------- Reads ----------------
 
 def load_payload() -> Dict[str, Any]:
-    if not STORAGE_PATH.exists():
-        return {"tables": []}
-    with open(STORAGE_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)
+    """
+    Materialize every stored table. Prefer the per-table readers below.
+    """
+    return {"tables": [
+        {"name": name, "columns": list_columns(name), "rows": get_rows(name)}
+        for name in list_tables()
+    ]}
 
 def list_tables() -> List[str]:
-    data = load_payload()
-    return [t["name"] for t in data.get("tables", [])]
+    return list(_load_catalog())
 
 def list_columns(table_name: str):
-    data = load_payload()
-    for t in data.get("tables", []):
-        if t["name"] == table_name:
-            return t["columns"]
-    return []
+    manifest = _manifest(table_name)
+    return list(manifest["columns"]) if manifest else []
 
 def get_rows(table_name: str):
-    data = load_payload()
-    for t in data.get("tables", []):
-        if t["name"] == table_name:
-            return t["rows"]
-    return []
+    return list(iter_rows(table_name))
 
 def preview_table(table_name: str, limit: int = 50):
-    data = load_payload()
-    for t in data.get("tables", []):
-        if t["name"] == table_name:
-            return t["rows"][: min(limit, MAX_PREVIEW_ROWS)]
-    return []
+    return list(islice(iter_rows(table_name), min(limit, MAX_PREVIEW_ROWS)))
 
 def transform_table(table_name: str, columns: List[str]):
     """
     Return rows filtered to only include the selected columns, shape as list of objects.
     """
-    data = load_payload()
-    for t in data.get("tables", []):
-        if t["name"] == table_name:
-            idx_map = []
-            for c in columns:
-                try:
-                    idx_map.append(t["columns"].index(c))
-                except ValueError:
-                    idx_map.append(None)
-            result = []
-            for row in t["rows"]:
-                obj = {}
-                for i, col in enumerate(columns):
-                    idx = idx_map[i]
-                    obj[col] = row[idx] if (idx is not None and idx < len(row)) else None
-                result.append(obj)
-            return result
-    return []
+    manifest = _manifest(table_name)
+    if not manifest:
+        return []
+    idx_map = []
+    for c in columns:
+        try:
+            idx_map.append(manifest["columns"].index(c))
+        except ValueError:
+            idx_map.append(None)
+    result = []
+    for row in iter_rows(table_name):
+        obj = {}
+        for i, col in enumerate(columns):
+            idx = idx_map[i]
+            obj[col] = row[idx] if (idx is not None and idx < len(row)) else None
+        result.append(obj)
+    return result
+
+def iter_batches(table_name: str, batch_size: int = 5000) -> Iterator[List[List[Any]]]:
+    """
+    Stored rows in lists of up to `batch_size`, read lazily from the segments.
+    """
+    return _batched(iter_rows(table_name), batch_size)
+
+def export_rows(table_name: str, batch_size: int = 5000):
+    """
+    (columns, column types, row batches) of a stored table for exporters.
+    Types come from the profile, which covers every stored row, so a column
+    is only numeric / boolean when all of its values are.
+    """
+    with _lock:
+        manifest = _manifest(table_name)
+        if not manifest:
+            raise ValueError(f"Table not found: {table_name}")
+        columns = list(manifest["columns"])
+        batches = iter_batches(table_name, batch_size)  # snapshot matches the profile
+        profile = get_profile(table_name) or {"columns": []}
+    col_profiles = {c["name"]: c for c in profile["columns"]}
+    types = [_export_type(col_profiles.get(c)) for c in columns]
+    return columns, types, batches
+
+def _export_type(col: Optional[Dict[str, Any]]) -> str:
+    if not col or not col.get("types"):
+        return "string"
+    seen = set(col["types"])
+    bounds = [abs(v) for v in (col["min"], col["max"]) if isinstance(v, (int, float))]
+    if seen == {"integer"} and all(b < 2 ** 63 for b in bounds):
+        return "integer"
+    if seen <= {"integer", "float"} and all(b <= 2 ** 53 for b in bounds):
+        return "float"  # ints up to 2**53 widen to float64 exactly
+    if seen == {"boolean"}:
+        return "boolean"
+    return "string"
+
+def _batched(rows: Iterator[List[Any]], batch_size: int) -> Iterator[List[List[Any]]]:
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+def iter_rows(table_name: str) -> Iterator[List[Any]]:
+    """
+    Lazily merge a table's segments into rows, one row in memory at a time.
+    Keyless tables return every stored row; keyed tables return the latest
+    version of every key, in the order those versions were written.
+    """
+    return (row for _, row in _scan(table_name))
+
+# ---------------- Compaction ----------------
+
+def compact_table(table_name: str) -> None:
+    """
+    Merge all current segments of a table into one and recompute its profile.
+    Segments appended meanwhile are merged by another pass, up to a few.
+    """
+    for _ in range(COMPACT_MAX_PASSES):
+        if not _compact_once(table_name):
+            return
+
+def _compact_once(table_name: str) -> bool:
+    """
+    One compaction pass, streamed to disk. Returns True when segments
+    arrived during the pass and are still unmerged.
+    """
+    with _lock:
+        manifest = _manifest(table_name)
+        if not manifest or len(manifest["segments"]) <= 1:
+            return False
+        table_dir = TABLES_PATH / _load_catalog()[table_name]
+        merged_segments = list(manifest["segments"])
+        columns = list(manifest["columns"])
+        target = _next_segment(manifest)
+        _save_manifest(table_name, manifest)
+        rows = _scan(table_name)
+
+    def written():
+        with open(table_dir / target, "w", encoding="utf-8") as f:
+            for seq, row in rows:
+                f.write(_dumps([seq, row]) + "\n")
+                yield row
+
+    profile = profile_rows(table_name, columns, written(), PROFILE_CHUNK_ROWS)
+
+    with _lock:
+        if _load_catalog().get(table_name) != table_dir.name:
+            return False  # table dropped meanwhile
+        manifest = _manifest(table_name)
+        now = time.time()
+        manifest["garbage"] = [g for g in manifest.get("garbage", []) if not _collect(table_dir, g, now)]
+        manifest["garbage"] += [[s, now] for s in merged_segments]
+        manifest["segments"] = [target] + [s for s in manifest["segments"] if s not in merged_segments]
+        if table_name in _indexes:
+            _replace_index(table_name, manifest, table_dir, _indexes[table_name])  # drops superseded lines
+        else:
+            _save_manifest(table_name, manifest)
+        if len(manifest["segments"]) > 1:
+            return True
+        profiles = dict(load_profiles())
+        profiles[table_name] = profile
+        save_profiles(profiles)
+        return False
+
+def _maybe_compact(table_name: str) -> None:
+    with _lock:
+        manifest = _manifest(table_name)
+        if not manifest or len(manifest["segments"]) <= COMPACT_AFTER_SEGMENTS or table_name in _compacting:
+            return
+        _compacting.add(table_name)
+
+    def run():
+        try:
+            compact_table(table_name)
+        finally:
+            with _lock:
+                _compacting.discard(table_name)
+
+    threading.Thread(target=run, daemon=True).start()
+
+def _collect(table_dir: Path, garbage: List[Any], now: float) -> bool:
+    name, since = garbage
+    if now - since < GARBAGE_GRACE_SECONDS:
+        return False
+    (table_dir / name).unlink(missing_ok=True)
+    return True
+
+# ---------------- Writes ----------------
+
+def _write_rows(table: Dict[str, Any], key: Optional[List[str]], dedupe: bool) -> Tuple[Dict[str, Any], int]:
+    """
+    Append the rows of `table` as one segment.
+    Keyed tables keep one row per key: unchanged rows are skipped, changed
+    ones replace the stored version. Keyless tables skip already stored
+    rows only when `dedupe` is set.
+    Returns the written delta as a normalized table and how many stored rows it replaced.
+    """
+    name = table["name"]
+    columns = [str(c) for c in table.get("columns", [])]
+    manifest = _manifest(name)
+    stored_columns = _columns_after(table, key, manifest)
+    if manifest is None:
+        manifest = _create_table(name, stored_columns, key)
+    try:
+        return _append_rows(name, manifest, columns, stored_columns, table.get("rows", []), key, dedupe)
+    except BaseException:
+        # in-memory changes are dropped; on disk nothing counts until the manifest lists it
+        _manifests.pop(name, None)
+        raise
+
+def _append_rows(name: str, manifest: Dict[str, Any], columns: List[str], stored_columns: List[str],
+                 rows: List[List[Any]], key: Optional[List[str]], dedupe: bool) -> Tuple[Dict[str, Any], int]:
+    # new columns are added at the end; incoming rows follow the stored order
+    manifest["columns"] = stored_columns
+    positions = [stored_columns.index(c) for c in columns]
+    width = len(stored_columns)
+
+    table_dir = TABLES_PATH / _load_catalog()[name]
+    replaced = 0
+    if key and not manifest.get("key"):
+        replaced += _set_key(name, manifest, table_dir, list(key))
+    key_idx = _key_indexes(manifest)
+    # plain keyless appends never look at the index, so it is only loaded when needed
+    index = _index(name, table_dir) if key_idx or dedupe else _indexes.get(name)
+
+    delta: Dict[Any, Tuple[int, List[Any]]] = {}
+    kept: List[Tuple[int, int, List[Any]]] = []
+    for src in rows:
+        row = [None] * width
+        for pos, value in zip(positions, src):
+            row[pos] = value
+        row = _stored(row)
+        h = _row_hash(row)
+        if key_idx:
+            ident = _key_ident(row, key_idx)
+            entry = index.get(ident)
+            if entry and entry[0] == h:
+                delta.pop(ident, None)  # back to the stored version
+                continue
+            delta[ident] = (h, row)  # a later row in the same upload wins, too
+        elif dedupe:
+            if h in index or h in delta:
+                continue  # identical row already stored
+            delta[h] = (h, row)
+        else:
+            kept.append((h, h, row))
+    items = [(ident, h, row) for ident, (h, row) in delta.items()] + kept
+
+    entries = []
+    if items:
+        segment = _next_segment(manifest)
+        seq = manifest["seq"]
+        index_path = table_dir / _index_file(manifest)
+        _truncate_index(index_path, manifest.get("index_size"))
+        with open(table_dir / segment, "w", encoding="utf-8") as f, open(index_path, "ab") as log:
+            for ident, h, row in items:
+                f.write(_dumps([seq, row]) + "\n")
+                if key_idx:
+                    if ident in index:
+                        replaced += 1
+                    log.write(f"{ident}\t{h:x}\t{seq}\n".encode("utf-8"))
+                    entries.append((ident, (h, seq)))
+                else:
+                    log.write(f"{h:x}\n".encode("ascii"))
+                seq += 1
+            index_size = log.tell()
+        manifest["segments"].append(segment)
+        manifest["seq"] = seq
+        manifest["index_size"] = index_size
+    _save_manifest(name, manifest)
+
+    # committed: only now do the index and running readers see the new rows
+    if key_idx:
+        for ident, entry in entries:
+            _set_entry(name, index, ident, entry)
+    elif index is not None:
+        index.update(h for _, h, _ in items)
+    return {"name": name, "columns": stored_columns, "rows": [row for _, _, row in items]}, replaced
+
+def _columns_after(table: Dict[str, Any], key: Optional[List[str]], manifest: Optional[Dict[str, Any]]) -> List[str]:
+    """
+    Stored columns of a table once `table` is written into it; raises when
+    `key` does not fit, before anything is created or changed.
+    """
+    name = table["name"]
+    columns = list(manifest["columns"]) if manifest else []
+    for c in table.get("columns", []):
+        if str(c) not in columns:
+            columns.append(str(c))
+    if key and manifest and manifest.get("key") and manifest["key"] != list(key):
+        raise ValueError(f"Table {name} is keyed on {manifest['key']}, not {list(key)}")
+    for k in key or []:
+        if k not in columns:
+            raise ValueError(f"Key column not found in {name}: {k}")
+    return columns
+
+def _set_key(name: str, manifest: Dict[str, Any], table_dir: Path, key: List[str]) -> int:
+    """
+    Key a keyless table: re-index its rows by `key`, later rows winning.
+    Returns how many stored rows the new key collapses.
+    """
+    key_idx = [manifest["columns"].index(k) for k in key]
+    index: Dict[str, Tuple[int, int]] = {}
+    total = 0
+    for seq, row in _scan(name):
+        index[_key_ident(row, key_idx)] = (_row_hash(row), seq)
+        total += 1
+    manifest["key"] = key
+    _replace_index(name, manifest, table_dir, index)
+    _indexes[name] = index
+    return total - len(index)
+
+def _create_table(name: str, columns: List[str], key: Optional[List[str]]) -> Dict[str, Any]:
+    catalog = _load_catalog()
+    dirname = re.sub(r"[^\w-]", "_", name)[:40] + "-" + uuid.uuid4().hex[:8]
+    (TABLES_PATH / dirname).mkdir(parents=True, exist_ok=True)
+    manifest = {"name": name, "columns": list(columns), "key": list(key) if key else None,
+                "segments": [], "next": 1, "seq": 1, "garbage": [],
+                "index": "hashes.log", "index_size": 0}
+    # the manifest exists before the catalog lists the table
+    _save_json(TABLES_PATH / dirname / "manifest.json", manifest)
+    catalog[name] = dirname
+    _save_json(CATALOG_PATH, catalog)
+    _manifests[name] = manifest
+    _indexes[name] = {} if key else set()
+    return manifest
+
+def _drop_all() -> None:
+    catalog = _load_catalog()
+    for dirname in catalog.values():
+        shutil.rmtree(TABLES_PATH / dirname, ignore_errors=True)
+    catalog.clear()
+    _manifests.clear()
+    _indexes.clear()
+    _save_json(CATALOG_PATH, catalog)
+
+# ---------------- Reads ----------------
+
+class _Snapshot:
+    """
+    A reader's view of a table. Writers record here the index entries they
+    overwrite while the reader runs, so it keeps resolving keys as of its start.
+    """
+
+    def __init__(self):
+        self.overrides: Dict[str, Optional[Tuple[int, int]]] = {}
+
+    def entry(self, index: Dict[str, Tuple[int, int]], ident: str) -> Optional[Tuple[int, int]]:
+        if ident in self.overrides:
+            return self.overrides[ident]
+        entry = index.get(ident)
+        # a writer records the override before it touches the index
+        return self.overrides[ident] if ident in self.overrides else entry
+
+def _scan(table_name: str) -> Iterator[Tuple[int, List[Any]]]:
+    """
+    (seq, row) pairs of the current rows; the snapshot is taken right away.
+    """
+    with _lock:
+        manifest = _manifest(table_name)
+        if not manifest:
+            return iter(())
+        table_dir = TABLES_PATH / _load_catalog()[table_name]
+        segments = list(manifest["segments"])
+        width = len(manifest["columns"])
+        key_idx = _key_indexes(manifest)
+        index = _index(table_name, table_dir) if key_idx else {}
+        snapshot = _Snapshot()
+        if key_idx:
+            _readers.setdefault(table_name, weakref.WeakSet()).add(snapshot)
+
+    def rows():
+        for seq, row in _read_segments(table_dir, segments):
+            if len(row) < width:
+                row = row + [None] * (width - len(row))
+            if key_idx:
+                entry = snapshot.entry(index, _key_ident(row, key_idx))
+                if not entry or entry[1] != seq:
+                    continue  # superseded by a later version
+            yield seq, row
+
+    return rows()
+
+def _set_entry(table_name: str, index: Dict[str, Tuple[int, int]], ident: str, entry: Tuple[int, int]) -> None:
+    for snapshot in list(_readers.get(table_name, ())):
+        snapshot.overrides.setdefault(ident, index.get(ident))
+    index[ident] = entry
+
+# ---------------- Helpers ----------------
+
+def _load_catalog() -> Dict[str, str]:
+    global _catalog
+    with _lock:
+        if _catalog is None:
+            if CATALOG_PATH.exists():
+                with open(CATALOG_PATH, "r", encoding="utf-8") as f:
+                    _catalog = json.load(f)
+            else:
+                _catalog = {}
+                _migrate_legacy()
+        return _catalog
+
+def _migrate_legacy() -> None:
+    """
+    Import the old single-file uploaded.json into segment storage once
+    (the catalog existing marks the migration as done).
+    """
+    if STORAGE_PATH.exists():
+        with open(STORAGE_PATH, "r", encoding="utf-8") as f:
+            payload = json.load(f)
+        for table in payload.get("tables", []):
+            _write_rows(table, None, dedupe=False)
+    _save_json(CATALOG_PATH, _catalog)
+
+def _manifest(table_name: str) -> Optional[Dict[str, Any]]:
+    with _lock:
+        if table_name not in _manifests:
+            dirname = _load_catalog().get(table_name)
+            if dirname is None:
+                return None
+            with open(TABLES_PATH / dirname / "manifest.json", "r", encoding="utf-8") as f:
+                _manifests[table_name] = json.load(f)
+        return _manifests[table_name]
+
+def _save_manifest(table_name: str, manifest: Dict[str, Any]) -> None:
+    _save_json(TABLES_PATH / _load_catalog()[table_name] / "manifest.json", manifest)
+
+def _next_segment(manifest: Dict[str, Any]) -> str:
+    segment = f"seg-{manifest['next']:06d}.ndjson"
+    manifest["next"] += 1
+    return segment
+
+def _index_file(manifest: Dict[str, Any]) -> str:
+    return manifest.get("index") or "hashes.log"
+
+def _index(table_name: str, table_dir: Path):
+    """
+    Keyed tables: key ident -> (row hash, seq of the key's latest version).
+    Keyless tables: the set of stored row hashes, for append dedupe.
+    Only the committed part of the log is read.
+    """
+    if table_name not in _indexes:
+        manifest = _manifest(table_name)
+        keyed = bool(manifest.get("key"))
+        index = {} if keyed else set()
+        path = table_dir / _index_file(manifest)
+        size = manifest.get("index_size")
+        if path.exists():
+            with open(path, "rb") as f:
+                pos = 0
+                for line in f:
+                    pos += len(line)
+                    if size is not None and pos > size:
+                        break  # written by a write that never committed
+                    parts = line.decode("utf-8").rstrip("\n").rsplit("\t", 2)
+                    if keyed:
+                        index[parts[0]] = (int(parts[1], 16), int(parts[2]))
+                    else:
+                        index.add(int(parts[1] if len(parts) == 3 else parts[0], 16))
+        _indexes[table_name] = index
+    return _indexes[table_name]
+
+def _truncate_index(path: Path, size: Optional[int]) -> None:
+    # appends must follow the committed lines, not those of an interrupted write
+    if size is not None and path.exists() and path.stat().st_size > size:
+        os.truncate(path, size)
+
+def _replace_index(table_name: str, manifest: Dict[str, Any], table_dir: Path, index) -> None:
+    """
+    Write `index` as a fresh log and save the manifest pointing at it.
+    The old log stays valid until the manifest switches over.
+    """
+    old = _index_file(manifest)
+    new = f"hashes-{manifest['next']:06d}.log"
+    manifest["next"] += 1
+    with open(table_dir / new, "wb") as f:
+        if isinstance(index, dict):
+            f.writelines(f"{ident}\t{h:x}\t{seq}\n".encode("utf-8") for ident, (h, seq) in index.items())
+        else:
+            f.writelines(f"{h:x}\n".encode("ascii") for h in index)
+        manifest["index_size"] = f.tell()
+    manifest["index"] = new
+    _save_manifest(table_name, manifest)
+    (table_dir / old).unlink(missing_ok=True)
+
+def _read_segments(table_dir: Path, segments: List[str]) -> Iterator[List[Any]]:
+    for segment in segments:
+        with open(table_dir / segment, "r", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+
+def _key_indexes(manifest: Dict[str, Any]) -> List[int]:
+    return [manifest["columns"].index(k) for k in manifest.get("key") or [] if k in manifest["columns"]]
+
+def _key_ident(row: List[Any], key_idx: List[int]) -> str:
+    return "k:" + _dumps([row[i] for i in key_idx])
+
+def _stored(row: List[Any]) -> List[Any]:
+    # rows are profiled in the form they are stored in, e.g. datetimes as
+    # strings, so profiles stay comparable across restarts and compactions
+    if all(v is None or isinstance(v, (str, int, float)) for v in row):
+        return row
+    return json.loads(_dumps(row))
+
+def _row_hash(row: List[Any]) -> int:
+    # trailing nulls are ignored so rows stored before a column was added still match
+    end = len(row)
+    while end and row[end - 1] is None:
+        end -= 1
+    return int.from_bytes(hashlib.blake2b(_dumps(row[:end]).encode("utf-8"), digest_size=16).digest(), "big")
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str)
+
+def _save_json(path: Path, data: Any) -> None:
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
@@ -0,0 +1,222 @@
+# backend/exporters.py
+import csv
+import io
+import json
+import re
+from typing import Any, AsyncIterator, List, Optional, Sequence
+from urllib.parse import quote
+
+EXPORT_BATCH_ROWS = 5000
+
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+COMPRESSIONS = ("none", "zstd")
+TYPED_FORMATS = ("parquet", "arrow")  # formats whose schema needs column types
+
+# Column types every source declares up front, so Parquet / Arrow schemas
+# never depend on which values happen to come first
+COLUMN_TYPES = ("integer", "float", "boolean", "date", "timestamp", "timestamptz", "string")
+
+# Exports are built from batches of row sequences (lists, tuples or asyncpg
+# Records) that arrive with their column names and types; rows are never
+# turned into dicts except for NDJSON lines. Every writer yields bytes as soon
+# as a batch is encoded, so memory stays at about one batch.
+
+
+def content_type(fmt: str, compression: str) -> str:
+    # Parquet / Arrow compress internally and stay regular files of their format
+    if compression == "zstd" and fmt in ("csv", "ndjson"):
+        return "application/zstd"
+    return FORMATS[fmt][0]
+
+
+def content_disposition(name: str, fmt: str, compression: str) -> str:
+    """
+    Attachment header safe for any table name: an ASCII fallback plus the
+    RFC 5987 UTF-8 form.
+    """
+    full = filename(name, fmt, compression)
+    fallback = re.sub(r'[^A-Za-z0-9._-]', "_", full)
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(full, safe='')}"
+
+
+def filename(name: str, fmt: str, compression: str) -> str:
+    suffix = ".zst" if compression == "zstd" and fmt in ("csv", "ndjson") else ""
+    return f"{name}.{FORMATS[fmt][1]}{suffix}"
+
+
+def validate(fmt: str, compression: str) -> None:
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}. Use one of {list(FORMATS)}")
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unsupported compression: {compression}. Use one of {list(COMPRESSIONS)}")
+    if fmt in TYPED_FORMATS:
+        _require("pyarrow")
+    if compression == "zstd" and fmt in ("csv", "ndjson"):
+        _require("zstandard")
+
+
+async def export(
+    columns: List[str],
+    batches: AsyncIterator[Sequence[Sequence[Any]]],
+    fmt: str = "csv",
+    compression: str = "none",
+    types: Optional[List[str]] = None,
+) -> AsyncIterator[bytes]:
+    """
+    Encode batches as `fmt`. Parquet and Arrow IPC compress their buffers
+    with zstd themselves; CSV and NDJSON are wrapped in a zstd frame.
+    `types` (one of COLUMN_TYPES per column, default string) fixes the
+    Parquet / Arrow schema.
+    """
+    validate(fmt, compression)
+    if fmt == "csv":
+        out = _csv(columns, batches)
+    elif fmt == "ndjson":
+        out = _ndjson(columns, batches)
+    else:
+        out = _arrow(columns, types or ["string"] * len(columns), batches, fmt, compression)
+
+    if compression == "zstd" and fmt in ("csv", "ndjson"):
+        out = _zstd(out)
+    async for chunk in out:
+        if chunk:
+            yield chunk
+
+
+# ---------------- Row formats ----------------
+
+async def _csv(columns, batches) -> AsyncIterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    async for batch in batches:
+        writer.writerows([_csv_cell(v) for v in row] for row in batch)
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+    yield buf.getvalue().encode("utf-8")
+
+
+def _csv_cell(value: Any) -> Any:
+    # nested Mongo documents / arrays as JSON, not Python repr
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False, default=str)
+    return value
+
+
+async def _ndjson(columns, batches) -> AsyncIterator[bytes]:
+    async for batch in batches:
+        yield "".join(
+            json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=str) + "\n"
+            for row in batch
+        ).encode("utf-8")
+
+
+async def _zstd(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    import zstandard
+
+    compressor = zstandard.ZstdCompressor().compressobj()
+    async for chunk in chunks:
+        yield compressor.compress(chunk)
+    yield compressor.flush()
+
+
+# ---------------- Columnar formats ----------------
+
+class _Sink(io.RawIOBase):
+    """
+    Write-only file object the Arrow writers write into; drained after each batch.
+    """
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+async def _arrow(columns, types, batches, fmt: str, compression: str) -> AsyncIterator[bytes]:
+    import pyarrow as pa
+
+    sink = _Sink()
+    schema = pa.schema([pa.field(name, _arrow_type(pa, t)) for name, t in zip(columns, types)])
+    codec = "zstd" if compression == "zstd" else None
+    writer = _open_writer(pa, sink, schema, fmt, codec)
+    try:
+        async for batch in batches:
+            if not batch:
+                continue
+            arrays = [_to_array(pa, col, field) for col, field in zip(_transpose(batch, columns), schema)]
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            yield sink.drain()
+    finally:
+        if writer is not None:
+            writer.close()
+    yield sink.drain()
+
+
+def _open_writer(pa, sink, schema, fmt: str, codec: Optional[str]):
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        return pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema, compression=codec or "none")
+    options = pa.ipc.IpcWriteOptions(compression=codec)
+    return pa.ipc.new_stream(pa.PythonFile(sink, mode="w"), schema, options=options)
+
+
+def _transpose(batch, columns) -> List[Sequence[Any]]:
+    # rows are full width (the readers pad them), so this is a plain transpose
+    return list(zip(*batch)) if columns else []
+
+
+def _arrow_type(pa, name: str):
+    return {
+        "integer": pa.int64(),
+        "float": pa.float64(),
+        "boolean": pa.bool_(),
+        "date": pa.date32(),
+        "timestamp": pa.timestamp("us"),
+        "timestamptz": pa.timestamp("us", tz="UTC"),
+    }.get(name, pa.string())
+
+
+def _to_array(pa, values, field):
+    typ = field.type
+    if pa.types.is_string(typ):
+        return pa.array([_as_str(v) for v in values], type=typ)
+    # pyarrow truncates 2.5 to 2 for int64 even with safe=True, so check first
+    if pa.types.is_integer(typ) and any(v is not None and (type(v) is not int) for v in values):
+        raise ValueError(f"Column {field.name} declared {typ} holds a non-integer value")
+    try:
+        return pa.array(values, type=typ, safe=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError) as e:
+        raise ValueError(f"Column {field.name} does not match its declared type {typ}: {e}")
+
+
+def _as_str(value: Any) -> Optional[str]:
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False, default=str)
+    return str(value)
+
+
+def _require(module: str) -> None:
+    try:
+        __import__(module)
+    except ImportError:
+        raise ValueError(f"This export needs the '{module}' package (pip install {module})")
@@ -0,0 +1,200 @@
+# backend/jobs.py
+import asyncio
+import json
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+JOBS_PATH = Path(__file__).parent / "storage" / "jobs"
+JOBS_PATH.mkdir(parents=True, exist_ok=True)
+
+MAX_PAGE_SIZE = 500  # safety
+JOB_TTL_SECONDS = 3600  # finished jobs (and their spool files) are dropped after this
+
+# job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, tenant: str, prompt: str, databases: List[Any]):
+        self.id = uuid.uuid4().hex
+        self.tenant = tenant
+        self.prompt = prompt
+        self.databases = databases
+        self.status = QUEUED
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self.spool_path = JOBS_PATH / f"{self.id}.ndjson"
+        # byte offset of every spooled line, so a page is a single seek + read
+        self.offsets: List[int] = []
+        self.updated = asyncio.Event()
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "jobId": self.id,
+            "tenant": self.tenant,
+            "status": self.status,
+            "total": len(self.databases),
+            "completed": len(self.offsets),
+            "error": self.error,
+            "createdAt": self.created_at,
+            "finishedAt": self.finished_at,
+        }
+
+    def spool(self, item: Dict[str, Any]) -> None:
+        """
+        Append one result as a compact NDJSON line.
+        """
+        line = json.dumps(item, separators=(",", ":"), ensure_ascii=False, default=str) + "\n"
+        with open(self.spool_path, "ab") as f:
+            self.offsets.append(f.tell())
+            f.write(line.encode("utf-8"))
+        self._notify()
+
+    def read(self, offset: int = 0, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Read up to `limit` spooled results starting at result index `offset`.
+        """
+        if offset < 0 or limit < 1:
+            raise ValueError("offset must be >= 0 and limit >= 1")
+        offsets = self.offsets[offset: offset + min(limit, MAX_PAGE_SIZE)]
+        if not offsets:
+            return []
+        items = []
+        with open(self.spool_path, "rb") as f:
+            f.seek(offsets[0])
+            for _ in offsets:
+                items.append(json.loads(f.readline()))
+        return items
+
+    def finish(self, status: str, error: Optional[str] = None) -> None:
+        self.status = status
+        self.error = error
+        self.finished_at = time.time()
+        self._notify()
+
+    def _notify(self) -> None:
+        # wake up every streaming reader, then re-arm
+        self.updated.set()
+        self.updated = asyncio.Event()
+
+
+class JobManager:
+    """
+    Runs multi-database prompts in the background.
+    `workers` bounds how many jobs run at once, `tenant_limit` how many of
+    those may belong to the same tenant, `max_pending` how many unfinished
+    jobs are accepted before submit is refused.
+    """
+
+    def __init__(
+        self,
+        runner: Callable[[Any, str], Awaitable[Dict[str, Any]]],
+        workers: int = 4,
+        tenant_limit: int = 2,
+        max_pending: int = 100,
+    ):
+        self.runner = runner
+        self.tenant_limit = tenant_limit
+        self.max_pending = max_pending
+        self.jobs: Dict[str, Job] = {}
+        self._workers = asyncio.Semaphore(workers)
+        # tenant -> [semaphore, jobs holding or waiting on it]; dropped when idle
+        self._tenants: Dict[str, List[Any]] = {}
+        self._clear_orphans()
+
+    # -------------------- Submit / Cancel --------------------
+
+    def submit(self, tenant: str, prompt: str, databases: List[Any]) -> Job:
+        self._cleanup()
+        pending = sum(1 for j in self.jobs.values() if j.status not in FINISHED_STATES)
+        if pending >= self.max_pending:
+            raise JobQueueFull(f"Too many pending jobs ({pending})")
+
+        job = Job(tenant, prompt, databases)
+        job.spool_path.touch()
+        self.jobs[job.id] = job
+        job.task = asyncio.create_task(self._run(job))
+        job.task.add_done_callback(lambda t: self._on_done(job, t))
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        job = self.jobs.get(job_id)
+        if job and job.status not in FINISHED_STATES and job.task:
+            job.task.cancel()
+        return job
+
+    # -------------------- Results --------------------
+
+    async def stream(self, job: Job, offset: int = 0):
+        """
+        Yield spooled NDJSON lines as they are written, until the job finishes.
+        """
+        while True:
+            updated = job.updated
+            items = job.read(offset, MAX_PAGE_SIZE)
+            for item in items:
+                yield json.dumps(item, separators=(",", ":"), ensure_ascii=False, default=str) + "\n"
+            offset += len(items)
+            if items:
+                continue
+            if job.status in FINISHED_STATES:
+                return
+            await updated.wait()
+
+    # -------------------- Worker --------------------
+
+    async def _run(self, job: Job) -> None:
+        entry = self._tenants.setdefault(job.tenant, [asyncio.Semaphore(self.tenant_limit), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                async with self._workers:
+                    job.status = RUNNING
+                    job._notify()
+                    for db in job.databases:
+                        job.spool(await self.runner(db, job.prompt))
+            job.finish(DONE)
+        except asyncio.CancelledError:
+            job.finish(CANCELLED)
+        except Exception as e:
+            job.finish(FAILED, str(e))
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._tenants[job.tenant]
+
+    def _on_done(self, job: Job, task: asyncio.Task) -> None:
+        # a task cancelled before it ever started never reaches _run's handler
+        if task.cancelled() and job.status not in FINISHED_STATES:
+            job.finish(CANCELLED)
+        # expire the job even if no further job is ever submitted
+        asyncio.get_running_loop().call_later(JOB_TTL_SECONDS + 1, self._cleanup)
+
+    def _cleanup(self) -> None:
+        now = time.time()
+        for job_id, job in list(self.jobs.items()):
+            if job.finished_at and now - job.finished_at > JOB_TTL_SECONDS:
+                job.spool_path.unlink(missing_ok=True)
+                del self.jobs[job_id]
+
+    def _clear_orphans(self) -> None:
+        # jobs live in memory only: spool files left by a previous run are unreachable
+        for path in JOBS_PATH.glob("*.ndjson"):
+            if path.stem not in self.jobs:
+                path.unlink(missing_ok=True)
@@ -10,21 +10,22 @@ client = OpenAI(api_key=settings.openai_api_key)
 
 
 class OpenAIClient:
-    async def generate_query(self, db_type: str, prompt: str, available_collections: list) -> dict:
+    async def generate_query(self, db_type: str, prompt: str, available_collections: list, schema_hints: str = "") -> dict:
         """Async wrapper to run GPT synchronously in executor"""
         loop = asyncio.get_event_loop()
         return await loop.run_in_executor(
-            executor, self._sync_generate, db_type, prompt, available_collections
+            executor, self._sync_generate, db_type, prompt, available_collections, schema_hints
         )
 
-    def _sync_generate(self, db_type: str, prompt: str, available_collections: list) -> dict:
+    def _sync_generate(self, db_type: str, prompt: str, available_collections: list, schema_hints: str = "") -> dict:
+        hints = f"\nKnown fields per collection (use these exact names):\n{schema_hints}\n" if schema_hints else ""
         system_prompt = f"""
 You are an expert MongoDB engineer.
 
 Database type: {db_type}.
 User instruction: {prompt}
 Available collections: {available_collections}
-
+{hints}
 Return a **valid JSON object** in this format:
 
 {{
@@ -41,6 +42,7 @@ Rules:
 1. Always return valid JSON parseable by Python json.loads().
 2. Use correct key names: "collection", "function", "parameters".
 3. Only include collections requested by the user.
+   Use field names from the known fields when they are listed.
 4. Apply filters, updates, or transformations according to the user instruction.
 5. Convert any date placeholders (now, today, CURRENT_TIMESTAMP, new Date()) into actual datetime objects in code.
 6. Do not include extra comments or explanations inside JSON.
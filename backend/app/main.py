@@ -1,11 +1,17 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import iterate_in_threadpool
+from typing import Any, Dict
 import logging
 
 from app.llm.openai_client import OpenAIClient
 from app.connectors.mongo import MongoInspector
 from app.connectors.sql import SQLInspector
-from app.models.agent import MultiDBRequest
+from app.models.agent import MultiDBRequest, DatabaseConfig, ExportQueryRequest
+from app.core.settings import settings
+from app import db_processor, exporters
+from app.jobs import Job, JobManager, JobQueueFull
 
 logger = logging.getLogger(__name__)
 
@@ -23,59 +29,177 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+async def run_database(db: DatabaseConfig, prompt: str) -> Dict[str, Any]:
+    """
+    Run the prompt against a single database and return its result entry.
+    """
+    inspector = None
+    try:
+        if db.type.lower() in ("mongo", "mongodb"):
+            inspector = MongoInspector(db)
+            await inspector.connect()
+            collections = await inspector.db.list_collection_names()
+            schemas = await inspector.infer_schema(collections)
+            llm = OpenAIClient()
+            query = await llm.generate_query("mongo", prompt, collections, inspector.schema_hints(schemas, prompt))
+
+            # query['collection'] can now be a list
+            data = await inspector.execute(query, collections)
+
+            return {
+                "dbType": db.type,
+                "dbHost": db.host,
+                "query": query,
+                "rows": data,  # data is now dict: {collection_name: results}
+                "metadata": {"collections": collections},
+                "error": None
+            }
+
+        else:
+            # SQL handling unchanged
+            inspector = SQLInspector(db.model_dump())
+            await inspector.connect()
+            tables = await inspector.list_tables()
+            llm = OpenAIClient()
+            query = await llm.generate_query("sql", prompt, tables)
+            data = await inspector.execute(query)
+
+            return {
+                "dbType": db.type,
+                "dbHost": db.host,
+                "query": query,
+                "rows": data,
+                "metadata": {"tables": tables},
+                "error": None
+            }
+
+    except Exception as e:
+        return {
+            "dbType": db.type,
+            "dbHost": db.host,
+            "query": None,
+            "rows": [],
+            "metadata": None,
+            "error": str(e)
+        }
+    finally:
+        # also runs when a job is cancelled mid-query
+        if inspector:
+            await inspector.close()
+
+
+jobs = JobManager(
+    run_database,
+    workers=settings.job_workers,
+    tenant_limit=settings.job_tenant_limit,
+    max_pending=settings.job_max_pending,
+)
+
+
 @app.post("/api/db-agent/run")
 async def run_multi_db(req: MultiDBRequest):
     results = []
 
     for db in req.databases:
-        try:
-            if db.type.lower() in ("mongo", "mongodb"):
-                inspector = MongoInspector(db)
-                await inspector.connect()
-                collections = await inspector.db.list_collection_names()
-                llm = OpenAIClient()
-                query = await llm.generate_query("mongo", req.prompt, collections)
-
-                # query['collection'] can now be a list
-                data = await inspector.execute(query, collections)
-                await inspector.close()
-
-                results.append({
-                    "dbType": db.type,
-                    "dbHost": db.host,
-                    "query": query,
-                    "rows": data,  # data is now dict: {collection_name: results}
-                    "metadata": {"collections": collections},
-                    "error": None
-                })
-
-            else:
-                # SQL handling unchanged
-                inspector = SQLInspector(db.model_dump())
-                await inspector.connect()
-                tables = await inspector.list_tables()
-                llm = OpenAIClient()
-                query = await llm.generate_query("sql", req.prompt, tables)
-                data = await inspector.execute(query)
-                await inspector.close()
-
-                results.append({
-                    "dbType": db.type,
-                    "dbHost": db.host,
-                    "query": query,
-                    "rows": data,
-                    "metadata": {"tables": tables},
-                    "error": None
-                })
-
-        except Exception as e:
-            results.append({
-                "dbType": db.type,
-                "dbHost": db.host,
-                "query": None,
-                "rows": [],
-                "metadata": None,
-                "error": str(e)
-            })
+        results.append(await run_database(db, req.prompt))
 
     return results
+
+# ---------------- Async jobs ----------------
+
+def _get_job(job_id: str) -> Job:
+    job = jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job
+
+@app.post("/api/db-agent/jobs", status_code=202)
+async def submit_job(req: MultiDBRequest, x_tenant_id: str = Header("default")):
+    try:
+        job = jobs.submit(x_tenant_id, req.prompt, req.databases)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return job.info()
+
+@app.get("/api/db-agent/jobs/{job_id}")
+async def job_status(job_id: str):
+    return _get_job(job_id).info()
+
+@app.get("/api/db-agent/jobs/{job_id}/results")
+async def job_results(job_id: str, offset: int = Query(0, ge=0), limit: int = Query(50, ge=1)):
+    job = _get_job(job_id)
+    items = job.read(offset, limit)
+    return {
+        **job.info(),
+        "offset": offset,
+        "results": items,
+        "nextOffset": offset + len(items),
+    }
+
+@app.get("/api/db-agent/jobs/{job_id}/stream")
+async def job_stream(job_id: str, offset: int = Query(0, ge=0)):
+    job = _get_job(job_id)
+    return StreamingResponse(jobs.stream(job, offset), media_type="application/x-ndjson")
+
+@app.delete("/api/db-agent/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    _get_job(job_id)
+    return jobs.cancel(job_id).info()
+
+# ---------------- Export ----------------
+
+def _check_export(fmt: str, compression: str) -> None:
+    try:
+        exporters.validate(fmt, compression)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _export_response(name: str, columns, types, batches, fmt: str, compression: str) -> StreamingResponse:
+    return StreamingResponse(
+        exporters.export(columns, batches, fmt, compression, types),
+        media_type=exporters.content_type(fmt, compression),
+        headers={"Content-Disposition": exporters.content_disposition(name, fmt, compression)},
+    )
+
+@app.get("/api/export/tables/{table_name}")
+async def export_table(table_name: str, format: str = "csv", compression: str = "none"):
+    _check_export(format, compression)
+    if table_name not in db_processor.list_tables():
+        raise HTTPException(status_code=404, detail=f"Table not found: {table_name}")
+    columns, types, batches = db_processor.export_rows(table_name, exporters.EXPORT_BATCH_ROWS)
+    # segment reads are blocking file IO, keep them off the event loop
+    return _export_response(table_name, columns, types, iterate_in_threadpool(batches), format, compression)
+
+@app.post("/api/export/query")
+async def export_query(req: ExportQueryRequest):
+    _check_export(req.format, req.compression)
+    is_mongo = req.db.type.lower() in ("mongo", "mongodb")
+    if is_mongo and not isinstance(req.query, dict):
+        raise HTTPException(status_code=400, detail="Mongo export query must be an object")
+    if not is_mongo and not isinstance(req.query, str):
+        raise HTTPException(status_code=400, detail="SQL export query must be a string")
+
+    inspector = MongoInspector(req.db) if is_mongo else SQLInspector(req.db)
+    await inspector.connect()
+    try:
+        if is_mongo:
+            name = req.query.get("collection") or "export"
+            columns, types, batches = await inspector.stream(
+                req.query, exporters.EXPORT_BATCH_ROWS, with_types=req.format in exporters.TYPED_FORMATS
+            )
+        else:
+            name = "query"
+            columns, types, batches = await inspector.stream(req.query, req.params, exporters.EXPORT_BATCH_ROWS)
+    except Exception as e:
+        await inspector.close()
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def closing():
+        # the connection has to outlive this handler, until the last batch is sent
+        try:
+            async for batch in batches:
+                yield batch
+        finally:
+            await inspector.close()
+
+    return _export_response(name, columns, types, closing(), req.format, req.compression)
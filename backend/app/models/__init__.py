@@ -1,4 +1,4 @@
 # app/connectors/__init__.py
 
 # Optional: import inspectors for easier access
-from .agent import MultiDBRequest, DatabaseConfig
+from .agent import MultiDBRequest, DatabaseConfig, ExportQueryRequest
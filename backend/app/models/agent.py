@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Any, Dict, Optional, List, Union
 class DatabaseConfig(BaseModel):
     type: str          # mongo | postgres | neo4j
     host: str
@@ -10,3 +10,9 @@ class DatabaseConfig(BaseModel):
 class MultiDBRequest(BaseModel):
     prompt: str
     databases: List[DatabaseConfig]
+class ExportQueryRequest(BaseModel):
+    db: DatabaseConfig
+    query: Union[str, Dict[str, Any]]  # SQL text, or {collection, filter, projection} for mongo
+    params: List[Any] = []
+    format: str = "csv"  # csv | ndjson | parquet | arrow
+    compression: str = "none"  # none | zstd
@@ -0,0 +1,254 @@
+# backend/profiling.py
+import base64
+import hashlib
+import json
+import math
+from collections import Counter
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+HLL_PRECISION = 10  # 2**10 registers, ~3% standard error
+TOP_K = 10
+HISTOGRAM_BINS = 10
+
+
+class HyperLogLog:
+    """
+    Approximate distinct counter. Registers serialize to a short base64
+    string so the sketch can be stored with the profile and merged later.
+    """
+
+    def __init__(self, p: int = HLL_PRECISION, registers: Optional[bytearray] = None):
+        self.p = p
+        self.m = 1 << p
+        self.registers = registers if registers is not None else bytearray(self.m)
+
+    def add(self, value: Any) -> None:
+        h = int.from_bytes(hashlib.blake2b(_hash_key(value), digest_size=8).digest(), "big")
+        idx = h >> (64 - self.p)
+        rest = h & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+
+    def merge(self, other: "HyperLogLog") -> None:
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+
+    def count(self) -> int:
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m * self.m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.m and zeros:
+            estimate = self.m * math.log(self.m / zeros)  # small range correction
+        return int(round(estimate))
+
+    def dumps(self) -> str:
+        return base64.b64encode(bytes(self.registers)).decode("ascii")
+
+    @classmethod
+    def loads(cls, data: str, p: int = HLL_PRECISION) -> "HyperLogLog":
+        return cls(p, bytearray(base64.b64decode(data)))
+
+
+def _hash_key(value: Any) -> bytes:
+    return json.dumps(value, sort_keys=True, default=str).encode("utf-8")
+
+
+def _value_type(value: Any) -> str:
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, int):
+        return "integer"
+    if isinstance(value, float):
+        return "float"
+    if isinstance(value, datetime):
+        return "datetime"
+    if isinstance(value, date):
+        return "date"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, (list, dict)):
+        return "object"
+    return "other"  # e.g. time, Decimal, bytes: counted, but no min/max
+
+
+def _infer_type(type_counts: Dict[str, int]) -> str:
+    if not type_counts:
+        return "empty"
+    if set(type_counts) == {"integer", "float"}:
+        return "float"
+    if len(type_counts) > 1:
+        return "mixed"
+    return next(iter(type_counts))
+
+
+def _histogram(values: List[float], lo: float, hi: float) -> Dict[str, Any]:
+    width = (hi - lo) / HISTOGRAM_BINS or 1
+    counts = [0] * HISTOGRAM_BINS
+    for v in values:
+        counts[min(int((v - lo) / width), HISTOGRAM_BINS - 1)] += 1
+    return {"edges": [lo + i * width for i in range(HISTOGRAM_BINS + 1)], "counts": counts}
+
+
+def profile_column(name: str, values: List[Any]) -> Dict[str, Any]:
+    """
+    Build the profile of a single column:
+    inferred type, null count, min/max, approx distinct, top-k and histogram.
+    """
+    hll = HyperLogLog()
+    type_counts: Counter = Counter()
+    counter: Counter = Counter()
+    nulls = 0
+    present = []
+
+    for v in values:
+        if v is None or (isinstance(v, float) and math.isnan(v)):
+            nulls += 1
+            continue
+        hll.add(v)
+        type_counts[_value_type(v)] += 1
+        if not isinstance(v, (list, dict)):
+            counter[v] += 1
+        present.append(v)
+
+    col_type = _infer_type(type_counts)
+    if col_type in ("integer", "float"):
+        # inf / -inf count as values but would break bounds and histogram bins
+        comparable = [v for v in present if _value_type(v) in ("integer", "float") and math.isfinite(v)]
+    elif col_type in ("string", "boolean", "datetime", "date"):
+        comparable = present
+    else:
+        comparable = []
+
+    lo = _merge_bounds(comparable, min)
+    hi = _merge_bounds(comparable, max)
+    histogram = None
+    if col_type in ("integer", "float") and comparable:
+        histogram = _histogram(comparable, lo, hi)
+
+    return {
+        "name": name,
+        "type": col_type,
+        "count": len(values),
+        "nulls": nulls,
+        "min": lo,
+        "max": hi,
+        "distinct": hll.count(),
+        "top": [[v, c] for v, c in counter.most_common(TOP_K)],
+        "histogram": histogram,
+        "types": dict(type_counts),
+        "hll": hll.dumps(),
+    }
+
+
+def profile_table(table: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Profile every column of a normalized table {name, columns, rows}.
+    """
+    columns = table.get("columns", [])
+    rows = table.get("rows", [])
+    profiles = []
+    for i, col in enumerate(columns):
+        values = [row[i] if i < len(row) else None for row in rows]
+        profiles.append(profile_column(col, values))
+    return {"name": table["name"], "rows": len(rows), "columns": profiles}
+
+
+def profile_rows(name: str, columns: List[str], rows: Iterable[List[Any]], chunk_rows: int = 50000) -> Dict[str, Any]:
+    """
+    Profile a stream of rows chunk by chunk, holding at most `chunk_rows` rows.
+    Exact except top-k and histograms, which merge approximately.
+    """
+    profile = profile_table({"name": name, "columns": columns, "rows": []})
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_rows:
+            profile = merge_profiles(profile, profile_table({"name": name, "columns": columns, "rows": chunk}))
+            chunk = []
+    if chunk:
+        profile = merge_profiles(profile, profile_table({"name": name, "columns": columns, "rows": chunk}))
+    return profile
+
+
+def _empty_column(name: str, rows: int) -> Dict[str, Any]:
+    profile = profile_column(name, [])
+    profile["count"] = profile["nulls"] = rows
+    return profile
+
+
+def _merge_bounds(values: List[Any], pick) -> Any:
+    values = [v for v in values if v is not None]
+    try:
+        return pick(values) if values else None
+    except TypeError:
+        return None  # incomparable types, e.g. after a column turned mixed
+
+
+def _rebin(histograms: List[Dict[str, Any]], lo: float, hi: float) -> Dict[str, Any]:
+    # approximate: every old bin's count lands where its midpoint falls
+    width = (hi - lo) / HISTOGRAM_BINS or 1
+    counts = [0] * HISTOGRAM_BINS
+    for hist in histograms:
+        edges = hist["edges"]
+        for i, c in enumerate(hist["counts"]):
+            mid = (edges[i] + edges[i + 1]) / 2
+            counts[max(0, min(int((mid - lo) / width), HISTOGRAM_BINS - 1))] += c
+    return {"edges": [lo + i * width for i in range(HISTOGRAM_BINS + 1)], "counts": counts}
+
+
+def merge_column(a: Dict[str, Any], b: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Combine the profiles of two row sets of the same column.
+    Distinct counts merge exactly (HLL); top-k and histograms approximately.
+    """
+    type_counts = Counter(a.get("types", {})) + Counter(b.get("types", {}))
+    col_type = _infer_type(dict(type_counts))
+    comparable = col_type not in ("object", "mixed", "empty", "other")
+    lo = _merge_bounds([a["min"], b["min"]], min) if comparable else None
+    hi = _merge_bounds([a["max"], b["max"]], max) if comparable else None
+
+    hll = HyperLogLog.loads(a["hll"])
+    hll.merge(HyperLogLog.loads(b["hll"]))
+
+    top: Counter = Counter()
+    for v, c in a["top"] + b["top"]:
+        top[v] += c
+
+    histogram = None
+    hists = [h for h in (a["histogram"], b["histogram"]) if h]
+    if col_type in ("integer", "float") and hists and lo is not None:
+        histogram = _rebin(hists, lo, hi)
+
+    return {
+        "name": a["name"],
+        "type": col_type,
+        "count": a["count"] + b["count"],
+        "nulls": a["nulls"] + b["nulls"],
+        "min": lo,
+        "max": hi,
+        "distinct": hll.count(),
+        "top": [[v, c] for v, c in top.most_common(TOP_K)],
+        "histogram": histogram,
+        "types": dict(type_counts),
+        "hll": hll.dumps(),
+    }
+
+
+def merge_profiles(a: Dict[str, Any], b: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Combine two table profiles, e.g. the stored one and the one of an appended delta.
+    A column missing on one side counts as nulls for that side's rows.
+    """
+    cols_a = {c["name"]: c for c in a["columns"]}
+    cols_b = {c["name"]: c for c in b["columns"]}
+    names = list(cols_a) + [n for n in cols_b if n not in cols_a]
+    columns = [
+        merge_column(cols_a.get(n) or _empty_column(n, a["rows"]), cols_b.get(n) or _empty_column(n, b["rows"]))
+        for n in names
+    ]
+    merged = {"name": a["name"], "rows": a["rows"] + b["rows"], "columns": columns}
+    if a.get("stale") or b.get("stale"):
+        merged["stale"] = True
+    return merged
+
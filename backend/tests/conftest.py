@@ -0,0 +1,36 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app import db_processor  # noqa: E402
+
+
+def reset_caches(monkeypatch) -> None:
+    """
+    Forget everything db_processor holds in memory, as after a restart.
+    """
+    monkeypatch.setattr(db_processor, "_catalog", None)
+    monkeypatch.setattr(db_processor, "_manifests", {})
+    monkeypatch.setattr(db_processor, "_indexes", {})
+    monkeypatch.setattr(db_processor, "_compacting", set())
+    monkeypatch.setattr(db_processor, "_readers", {})
+    monkeypatch.setattr(db_processor, "_profiles", None)
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    """
+    db_processor writing to an empty storage directory, compacting only on request.
+    """
+    tables = tmp_path / "tables"
+    tables.mkdir()
+    monkeypatch.setattr(db_processor, "STORAGE_PATH", tmp_path / "uploaded.json")
+    monkeypatch.setattr(db_processor, "PROFILES_PATH", tmp_path / "profiles.json")
+    monkeypatch.setattr(db_processor, "TABLES_PATH", tables)
+    monkeypatch.setattr(db_processor, "CATALOG_PATH", tables / "catalog.json")
+    monkeypatch.setattr(db_processor, "COMPACT_AFTER_SEGMENTS", 10 ** 6)
+    reset_caches(monkeypatch)
+    return db_processor
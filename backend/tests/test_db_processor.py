@@ -0,0 +1,178 @@
+import json
+
+import pytest
+
+from conftest import reset_caches
+
+
+def table(rows, columns=("id", "name"), name="t"):
+    return {"tables": [{"name": name, "columns": list(columns), "rows": rows}]}
+
+
+def rows_of(db, name="t"):
+    return sorted(db.get_rows(name), key=lambda r: (r[0] is None, r[0]))
+
+
+# ---------------- Append ----------------
+
+def test_append_skips_stored_and_repeated_rows(storage):
+    storage.save_payload(table([[1, "a"], [2, "b"]]))
+    storage.save_payload(table([[2, "b"], [3, "c"], [3, "c"]]), mode="append")
+
+    assert rows_of(storage) == [[1, "a"], [2, "b"], [3, "c"]]
+    assert storage.get_profile("t")["rows"] == 3
+
+
+def test_append_dedupes_against_rows_stored_before_a_restart(storage, monkeypatch):
+    storage.save_payload(table([[1, "a"], [2, "b"]]))
+    storage.save_payload(table([[3, "c"]]), mode="append")
+    reset_caches(monkeypatch)
+
+    storage.save_payload(table([[1, "a"], [3, "c"], [4, "d"]]), mode="append")
+
+    assert rows_of(storage) == [[1, "a"], [2, "b"], [3, "c"], [4, "d"]]
+
+
+def test_append_matches_rows_stored_before_a_column_was_added(storage):
+    storage.save_payload(table([[1, "a"]]))
+    storage.save_payload(table([[1, "a", None], [2, "b", "x"]], columns=("id", "name", "tag")), mode="append")
+
+    assert rows_of(storage) == [[1, "a", None], [2, "b", "x"]]
+
+
+def test_replace_keeps_duplicate_rows(storage):
+    storage.save_payload(table([[1, "a"], [1, "a"]]))
+
+    assert rows_of(storage) == [[1, "a"], [1, "a"]]
+
+
+# ---------------- Upsert ----------------
+
+def test_upsert_replaces_changed_rows_and_keeps_counts_exact(storage):
+    storage.save_payload(table([[i, f"v{i}"] for i in range(10)]), mode="upsert", key=["id"])
+    changed = [[i, f"new{i}"] for i in range(5)]
+    unchanged = [[i, f"v{i}"] for i in range(5, 8)]
+    added = [[10, "v10"], [11, "v11"]]
+    storage.save_payload(table(changed + unchanged + added), mode="upsert", key=["id"])
+
+    rows = rows_of(storage)
+    assert len(rows) == 12
+    assert rows[:5] == changed
+    assert rows[5:10] == [[i, f"v{i}"] for i in range(5, 10)]
+    profile = storage.get_profile("t")
+    assert profile["rows"] == 12
+    assert profile["stale"] is True
+
+    storage.compact_table("t")
+    profile = storage.get_profile("t")
+    assert profile["rows"] == 12
+    assert "stale" not in profile
+    assert rows_of(storage) == rows
+
+
+def test_upsert_last_row_of_an_upload_wins(storage):
+    storage.save_payload(table([[1, "a"], [1, "b"]]), mode="upsert", key=["id"])
+
+    assert rows_of(storage) == [[1, "b"]]
+    assert storage.get_profile("t")["rows"] == 1
+
+
+def test_upserts_survive_a_restart(storage, monkeypatch):
+    storage.save_payload(table([[1, "a"], [2, "b"]]), mode="upsert", key=["id"])
+    storage.save_payload(table([[1, "c"]]), mode="upsert", key=["id"])
+    reset_caches(monkeypatch)
+
+    assert rows_of(storage) == [[1, "c"], [2, "b"]]
+    storage.save_payload(table([[2, "d"]]), mode="upsert", key=["id"])
+    assert rows_of(storage) == [[1, "c"], [2, "d"]]
+
+
+# ---------------- Keys ----------------
+
+def test_first_upsert_keys_a_keyless_table(storage):
+    storage.save_payload(table([[1, "a"], [1, "b"], [2, "c"]]))
+    storage.save_payload(table([[2, "d"], [3, "e"]]), mode="upsert", key=["id"])
+
+    assert rows_of(storage) == [[1, "b"], [2, "d"], [3, "e"]]
+    assert storage.get_profile("t")["rows"] == 3
+    storage.save_payload(table([[1, "f"]]), mode="upsert", key=["id"])
+    assert rows_of(storage) == [[1, "f"], [2, "d"], [3, "e"]]
+
+
+def test_replace_can_create_a_keyed_table(storage):
+    storage.save_payload(table([[1, "a"], [1, "b"]]), key=["id"])
+
+    assert rows_of(storage) == [[1, "b"]]
+
+
+def test_upsert_with_another_key_is_refused(storage):
+    storage.save_payload(table([[1, "a"]]), mode="upsert", key=["id"])
+
+    with pytest.raises(ValueError, match="keyed on"):
+        storage.save_payload(table([[1, "b"]]), mode="upsert", key=["name"])
+    assert rows_of(storage) == [[1, "a"]]
+
+
+def test_missing_key_column_creates_no_table(storage, monkeypatch):
+    with pytest.raises(ValueError, match="Key column not found"):
+        storage.save_payload(table([[1]], columns=("a",)), mode="upsert", key=["id"])
+    assert storage.list_tables() == []
+
+    reset_caches(monkeypatch)
+    storage.save_payload(table([[1]], columns=("a",)), mode="append")
+    assert storage.get_rows("t") == [[1]]
+
+
+def test_missing_key_column_keeps_replaced_data(storage):
+    storage.save_payload(table([[1, "a"]]))
+
+    with pytest.raises(ValueError, match="Key column not found"):
+        storage.save_payload(table([[2]], columns=("a",)), key=["id"])
+    assert rows_of(storage) == [[1, "a"]]
+    assert storage.get_profile("t")["rows"] == 1
+    assert storage.list_columns("t") == ["id", "name"]
+
+
+# ---------------- Concurrent reads ----------------
+
+def test_read_keeps_its_snapshot_during_an_upsert(storage):
+    storage.save_payload(table([[1, "a"], [2, "b"], [3, "c"]]), mode="upsert", key=["id"])
+    reader = storage.iter_rows("t")
+    first = next(reader)
+
+    storage.save_payload(table([[2, "x"], [3, "y"], [4, "z"]]), mode="upsert", key=["id"])
+
+    assert [first] + list(reader) == [[1, "a"], [2, "b"], [3, "c"]]
+    assert rows_of(storage) == [[1, "a"], [2, "x"], [3, "y"], [4, "z"]]
+
+
+def test_read_keeps_its_snapshot_during_compaction(storage):
+    storage.save_payload(table([[1, "a"], [2, "b"]]), mode="upsert", key=["id"])
+    storage.save_payload(table([[2, "c"], [3, "d"]]), mode="upsert", key=["id"])
+    reader = storage.iter_rows("t")
+    first = next(reader)
+
+    storage.compact_table("t")
+    storage.save_payload(table([[1, "e"]]), mode="upsert", key=["id"])
+
+    assert sorted([first] + list(reader)) == [[1, "a"], [2, "c"], [3, "d"]]
+    assert rows_of(storage) == [[1, "e"], [2, "c"], [3, "d"]]
+
+
+# ---------------- Crash safety ----------------
+
+def test_index_lines_of_an_uncommitted_write_are_ignored(storage, monkeypatch):
+    storage.save_payload(table([[1, "a"], [2, "b"]]), mode="upsert", key=["id"])
+    dirname = json.loads(storage.CATALOG_PATH.read_text())["t"]
+    table_dir = storage.TABLES_PATH / dirname
+    manifest = json.loads((table_dir / "manifest.json").read_text())
+    # a write that got as far as the index but died before its manifest save
+    with open(table_dir / manifest["index"], "a", encoding="utf-8") as f:
+        f.write('k:[1]\t0\t%d\n' % manifest["seq"])
+    reset_caches(monkeypatch)
+
+    assert rows_of(storage) == [[1, "a"], [2, "b"]]
+    storage.save_payload(table([[3, "c"]]), mode="upsert", key=["id"])
+    assert rows_of(storage) == [[1, "a"], [2, "b"], [3, "c"]]
+    reset_caches(monkeypatch)
+    assert rows_of(storage) == [[1, "a"], [2, "b"], [3, "c"]]